@@ -1,15 +1,17 @@
+from claz.nodes import Nodes
 from claz.util import to_ascii
 
 
 class Airport:
+    __slots__ = ("nodes", "id", "ctry", "city", "code", "simple_name")
     missing_names = []
 
-    def __init__(self, ctry_: str, city_: str, code_: str, lat_: float, long_: float):
+    def __init__(self, ctry_: str, city_: str, code_: str, nodes: Nodes):
         self.ctry = ctry_
         self.city = city_
         self.code = code_
-        self.lat = lat_
-        self.long = long_
+        self.nodes = nodes
+        self.id: int = nodes.ids[code_]
         try:
             self.simple_name = to_ascii(city_[:city_.index("/")])
         except ValueError:
@@ -24,6 +26,14 @@ class Airport:
             self.city = code_
             self.simple_name = code_
 
+    @property
+    def lat(self) -> float:
+        return self.nodes.lat[self.id]
+
+    @property
+    def long(self) -> float:
+        return self.nodes.long[self.id]
+
     def __str__(self):
         return f"{self.code}:{self.city}"
 
@@ -0,0 +1,70 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+class DoorToDoorBase:
+    """
+    the parameter independent columns of the door to door model, one entry per route.
+    they are computed once, so that evaluating a DoorToDoor model is only array arithmetic.
+    """
+    def __init__(self, index: pd.Index, flight: np.ndarray, dur_rail: np.ndarray,
+                 access_orig: np.ndarray, access_dest: np.ndarray,
+                 ctry_orig: np.ndarray, countries: List[str],
+                 transfer_rows: np.ndarray, transfer_stations: np.ndarray,
+                 station_codes: List[str]):
+        self.index = index
+        self.flight = flight  # pure flight time in min
+        self.dur_rail = dur_rail  # rail time in min, NaN without a rail route
+        # km from the airport to its station, NaN if the airport has no station in the graph
+        self.access_orig = access_orig
+        self.access_dest = access_dest
+        self.ctry_orig = ctry_orig  # index into countries
+        self.countries = countries
+        # the intermediate stations of all rail routes, flattened:
+        # transfer_stations[k] is a station id on the route of row transfer_rows[k]
+        self.transfer_rows = transfer_rows
+        self.transfer_stations = transfer_stations
+        self.station_codes = station_codes
+
+
+class DoorToDoor:
+    """
+    door to door durations of flying and going by train, all durations are in min.
+    check_in maps country codes and transfer maps station codes to their own values,
+    everything else uses the defaults. the time to get to or from an airport follows from
+    its distance to the station it is mapped to, so it is NaN without a station in the graph.
+    """
+    def __init__(self, *, access_base=15, access_speed=40,
+                 check_in: Dict[str, float] = None, default_check_in=60, leave_airport=20,
+                 station_access=10, transfer: Dict[str, float] = None, default_transfer=10):
+        self.access_base = access_base  # fixed time to get to or from any airport
+        self.access_speed = access_speed  # km/h between the airport and the city centre
+        self.check_in = check_in or {}
+        self.default_check_in = default_check_in  # security, boarding, ...
+        self.leave_airport = leave_airport  # deboarding, baggage claim
+        self.station_access = station_access  # to and from a city centre station
+        self.transfer = transfer or {}
+        self.default_transfer = default_transfer  # per intermediate station of a route
+
+    def access(self, dist_km: np.ndarray) -> np.ndarray:
+        return self.access_base + dist_km / self.access_speed * 60
+
+    def evaluate(self, base: DoorToDoorBase) -> pd.DataFrame:
+        check_in = np.array([self.check_in.get(ctry, self.default_check_in)
+                             for ctry in base.countries], dtype=float)
+        transfer = np.array([self.transfer.get(code, self.default_transfer)
+                             for code in base.station_codes], dtype=float)
+
+        dur_fly = (self.access(base.access_orig) + check_in[base.ctry_orig] + base.flight
+                   + self.leave_airport + self.access(base.access_dest))
+        transfers = np.bincount(base.transfer_rows, weights=transfer[base.transfer_stations],
+                                minlength=len(base.index))
+        dur_rail = 2 * self.station_access + base.dur_rail + transfers
+        return pd.DataFrame({
+            "dur_fly_d2d": dur_fly,
+            "dur_rail_d2d": dur_rail,
+            "d2d_dif_abs": dur_rail - dur_fly,
+            "d2d_dif_prop": dur_rail / dur_fly,
+        }, index=base.index)
@@ -0,0 +1,31 @@
+from typing import List, Dict, Iterable
+
+import numpy as np
+
+
+class Nodes:
+    """
+    assigns dense integer ids to station or airport codes and keeps
+    their data in parallel arrays, indexed by those ids.
+    Station and Airport objects are only views on one row.
+    """
+    def __init__(self, codes: Iterable[str], type_="R"):
+        self.codes: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for code in codes:
+            if code not in self.ids:
+                self.ids[code] = len(self.codes)
+                self.codes.append(code)
+
+        size = len(self.codes)
+        self.lat = np.full(size, np.nan)  # y-axis
+        self.long = np.full(size, np.nan)  # x-axis
+        # R: rail, I: island, N: no rail, C: not connected, A: airport
+        self.type = np.full(size, type_, dtype="U1")
+        self.in_graph = np.zeros(size, dtype=bool)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def id_array(self, codes: Iterable[str]) -> np.ndarray:
+        return np.array([self.ids[code] for code in codes], dtype=np.intp)
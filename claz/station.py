@@ -1,34 +1,61 @@
-from typing import Union, Optional, List
-import numpy as np
+from typing import Union, Tuple
 
+from claz.nodes import Nodes
 from claz.util import to_ascii
 
 StatCode = Union["Station", str]
 
 
 class Station:
-    def __init__(self, name, code=None):
+    __slots__ = ("nodes", "id", "name", "simple_name", "code")
+
+    def __init__(self, name, code, type_, nodes: Nodes):
         self.name = name
         self.simple_name = to_ascii(name)
-        assert len(self.simple_name) >= 3
+        self.code = code
+        self.nodes = nodes
+        self.id: int = nodes.ids[code]
+        nodes.type[self.id] = type_
+
+    @staticmethod
+    def resolve_code(name, code) -> Tuple[str, str, str]:
+        """
+        the station codes json stores "I", "N" or "C" instead of a code for stations
+        that aren't on the rail network. returns (name, code, type).
+        """
+        simple_name = to_ascii(name)
+        assert len(simple_name) >= 3
         if code in ["I", "N", "C"]:
-            self.code = self.simple_name
-            self.type = code
-        else:
-            self.code = code
-            self.type = "R"
-        self.in_graph = None
+            return name, simple_name, code
+        return name, code, "R"
+
+    @property
+    def type(self) -> str:
+        return self.nodes.type[self.id]
+
+    @property
+    def in_graph(self) -> bool:
+        return bool(self.nodes.in_graph[self.id])
 
-        self.lat: Optional[float] = None
-        self.long: Optional[float] = None
+    @property
+    def lat(self) -> float:
+        return self.nodes.lat[self.id]
+
+    @lat.setter
+    def lat(self, value: float):
+        self.nodes.lat[self.id] = value
+
+    @property
+    def long(self) -> float:
+        return self.nodes.long[self.id]
+
+    @long.setter
+    def long(self, value: float):
+        self.nodes.long[self.id] = value
 
     @staticmethod
     def _get_station_code(other: StatCode):
-        return str if isinstance(other, str) else other.code
-
-    def loc_mean(self, lat: List[float], long: List[float]):
-        self.lat = np.mean(lat)
-        self.long = np.mean(long)
+        return other if isinstance(other, str) else other.code
 
     def __str__(self):
         return f"{self.code}({self.name})"
@@ -55,6 +82,4 @@ class Station:
         return self.code <= Station._get_station_code(other)
 
     def __hash__(self):
-        if self.code is None:
-            raise ValueError("You need to set the Station's code first")
         return hash(self.code)
@@ -0,0 +1,120 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import List, Dict, Any, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows, the spans are recorded without RSS there
+    resource = None
+
+# TRAIN_TRACE=path/to/trace.json switches the instrumentation on and writes the
+# spans there on exit. TRAIN_TRACE_FORMAT=chrome writes a chrome://tracing file instead.
+TRACE_FILE = os.environ.get("TRAIN_TRACE")
+TRACE_FORMAT = os.environ.get("TRAIN_TRACE_FORMAT", "json")
+ENABLED = bool(TRACE_FILE)
+
+# finished spans: {"name", "start", "duration", "counters",
+#                  "process_peak_rss", "process_peak_rss_growth", "pid", "tid"}
+# durations are in s, the RSS values in bytes (None if unavailable)
+spans: List[Dict[str, Any]] = []
+_local = threading.local()
+_origin = time.perf_counter()
+
+
+def _stack() -> List[Dict[str, Any]]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _process_peak_rss() -> Optional[int]:
+    # lifetime high-water mark of the whole process in bytes, not per span
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024  # kB except on macOS
+
+
+@contextmanager
+def span(name: str):
+    if not ENABLED:
+        yield
+        return
+    record = {"name": name, "start": time.perf_counter() - _origin, "counters": {},
+              "pid": os.getpid(), "tid": threading.get_ident()}
+    peak_rss_at_start = _process_peak_rss()
+    _stack().append(record)
+    try:
+        yield
+    finally:
+        _stack().pop()
+        record["duration"] = time.perf_counter() - _origin - record["start"]
+        record["process_peak_rss"] = _process_peak_rss()
+        # how far this span raised the process peak, 0 if it stayed below an earlier one
+        record["process_peak_rss_growth"] = (None if peak_rss_at_start is None else
+                                             record["process_peak_rss"] - peak_rss_at_start)
+        spans.append(record)
+
+
+def timed(name: str = None):
+    """
+    decorator that wraps the function in a span. when tracing is off,
+    the function is returned as it is, so it costs nothing.
+    """
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__qualname__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(counter: str, amount: int = 1):
+    """
+    adds amount to a counter (e.g. rows or edges) of the innermost open span
+    """
+    if not ENABLED or not _stack():
+        return
+    counters = _stack()[-1]["counters"]
+    counters[counter] = counters.get(counter, 0) + amount
+
+
+def export_json(file_path):
+    with open(file_path, "w") as f:
+        json.dump(spans, f, indent=2)
+
+
+def export_chrome_trace(file_path):
+    # complete events ("ph": "X") in microseconds, see the Trace Event Format
+    events = [{
+        "name": record["name"], "ph": "X", "pid": record["pid"], "tid": record["tid"],
+        "ts": record["start"] * 1e6, "dur": record["duration"] * 1e6,
+        "args": dict(record["counters"], process_peak_rss=record["process_peak_rss"],
+                     process_peak_rss_growth=record["process_peak_rss_growth"]),
+    } for record in spans]
+    with open(file_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def _export_at_exit():
+    if not spans:
+        return
+    if TRACE_FORMAT == "chrome":
+        export_chrome_trace(TRACE_FILE)
+    else:
+        export_json(TRACE_FILE)
+    print("stored trace of", len(spans), "spans to", TRACE_FILE)
+
+
+if ENABLED:
+    atexit.register(_export_at_exit)
@@ -1,6 +1,9 @@
+import hashlib
 import os
 import pickle
-from typing import List
+import re
+import tempfile
+from typing import List, Callable, Any, Dict, Tuple
 
 import numpy as np
 import unidecode
@@ -13,6 +16,9 @@ from pyproj import Geod
 
 LAT_RANGE = (35.0, 65.0)  # y-axis
 LONG_RANGE = (-11.0, 39.0)  # x-axis
+CACHE_DIR = "cache"
+STAGE_VERSION = 5  # bump this to invalidate all cached stage results
+CACHE_KEEP = 8  # results kept per stage, the least recently used ones are removed
 
 
 def get_eu_map(figsize=(10, 6)):
@@ -47,6 +53,66 @@ def dump_pickle(file_path, data):
         pickle.dump(data, handle, protocol=pickle.HIGHEST_PROTOCOL)
 
 
+# (path, mtime, size) -> sha1, so unchanged files are only read once
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def hash_file(file_path) -> str:
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _file_hashes:
+        with open(file_path, 'rb') as handle:
+            _file_hashes[key] = hashlib.sha1(handle.read()).hexdigest()
+    return _file_hashes[key]
+
+
+def hash_key(*parts) -> str:
+    """
+    content address of a stage: parts are upstream keys, file hashes and parameters
+    """
+    sha = hashlib.sha1()
+    for part in parts:
+        sha.update(repr(part).encode("utf-8"))
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def cached(stage: str, key: str, compute: Callable[[], Any]):
+    """
+    returns the stored result of stage for key, or computes and stores it.
+    key has to cover every input of compute, a stale key returns a stale result.
+    only the CACHE_KEEP most recently used results of each stage are kept in CACHE_DIR.
+    """
+    file_path = os.path.join(CACHE_DIR, f"{stage}_{key}.pickle")
+    if os.path.exists(file_path):
+        os.utime(file_path)  # marks it as recently used
+        return load_pickle(file_path)
+    result = compute()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # written next to the final file and renamed, so concurrent readers never see half a pickle
+    handle, temp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    os.close(handle)
+    try:
+        dump_pickle(temp_path, result)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    _evict(stage)
+    return result
+
+
+def _evict(stage: str):
+    pattern = re.compile(rf"{re.escape(stage)}_[0-9a-f]{{40}}\.pickle")
+    file_paths = [os.path.join(CACHE_DIR, f) for f in os.listdir(CACHE_DIR) if pattern.fullmatch(f)]
+    file_paths.sort(key=os.path.getmtime, reverse=True)
+    for file_path in file_paths[CACHE_KEEP:]:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:  # evicted by another process
+            pass
+
+
 class Karte:
     g = Geod(ellps='WGS84')
     cm = plt.cm.jet
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+
+from fly import Fly
+from kiss import Kiss
+from rail import Rail
+
+EXPORT_DB = "kiss.sqlite"
+
+SCHEMA = """
+CREATE TABLE params (name TEXT PRIMARY KEY, value REAL);
+CREATE TABLE stations (
+    id INTEGER PRIMARY KEY, code TEXT NOT NULL, name TEXT NOT NULL, type TEXT NOT NULL,
+    in_graph INTEGER NOT NULL, lat REAL, long REAL, region TEXT NOT NULL,
+    component INTEGER NOT NULL
+);
+CREATE TABLE airports (
+    id INTEGER PRIMARY KEY, code TEXT NOT NULL, city TEXT, ctry TEXT,
+    lat REAL NOT NULL, long REAL NOT NULL, station_id INTEGER REFERENCES stations(id)
+);
+CREATE TABLE rail_edges (
+    source_id INTEGER NOT NULL REFERENCES stations(id),
+    target_id INTEGER NOT NULL REFERENCES stations(id),
+    duration INTEGER NOT NULL, dist REAL, speed REAL
+);
+CREATE TABLE unnecessary_links (
+    source_id INTEGER NOT NULL REFERENCES stations(id),
+    target_id INTEGER NOT NULL REFERENCES stations(id),
+    dur_short INTEGER NOT NULL, dur_dir INTEGER NOT NULL, prop_longer REAL NOT NULL,
+    route TEXT NOT NULL
+);
+CREATE TABLE cat_routes (
+    orig_id INTEGER NOT NULL REFERENCES airports(id),
+    dest_id INTEGER NOT NULL REFERENCES airports(id),
+    pas INTEGER NOT NULL, dist_fly INTEGER NOT NULL, dur_fly INTEGER NOT NULL,
+    orig_station_id INTEGER REFERENCES stations(id),
+    dest_station_id INTEGER REFERENCES stations(id),
+    dur_rail INTEGER, speed_rail REAL, route TEXT,
+    orig_err TEXT, dest_err TEXT, orig_region TEXT NOT NULL, dest_region TEXT NOT NULL,
+    component INTEGER NOT NULL
+);
+"""
+
+# created after the bulk inserts, which is a lot faster than updating them row by row
+INDEXES = """
+CREATE UNIQUE INDEX stations_code ON stations(code);
+CREATE UNIQUE INDEX airports_code ON airports(code);
+CREATE INDEX airports_station ON airports(station_id);
+CREATE INDEX rail_edges_source ON rail_edges(source_id);
+CREATE INDEX rail_edges_target ON rail_edges(target_id);
+CREATE INDEX cat_routes_orig ON cat_routes(orig_id);
+CREATE INDEX cat_routes_dest ON cat_routes(dest_id);
+CREATE INDEX cat_routes_orig_station ON cat_routes(orig_station_id);
+CREATE INDEX cat_routes_dest_station ON cat_routes(dest_station_id);
+CREATE INDEX cat_routes_err ON cat_routes(orig_err, dest_err);
+CREATE INDEX cat_routes_dur_rail ON cat_routes(dur_rail);
+CREATE INDEX cat_routes_region ON cat_routes(orig_region, dest_region);
+"""
+
+
+def _optional(value, type_):
+    """
+    NaN, None and False (no error) are stored as NULL
+    """
+    if value is None or value is False or value != value:
+        return None
+    return type_(value)
+
+
+def export_sqlite(kiss: Kiss, file_path=EXPORT_DB):
+    """
+    writes the categorised routes, stations, airports, rail edges and unnecessary links
+    into an indexed SQLite file, so they can be queried without running the pipeline.
+    stations and airports are referenced by their ids, routes are json lists of station codes.
+    """
+    kiss.add_distance_data_to_rail_graph()
+    # written to a temp file next to the output and renamed,
+    # so a failed export leaves the previous one in place
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)),
+                                         suffix=".tmp")
+    os.close(handle)
+    try:
+        db = sqlite3.connect(temp_path)
+        try:
+            _write_tables(db, kiss)
+        finally:
+            db.close()
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    print(f"exported {len(kiss.cat_routes)} categorized routes to", file_path)
+
+
+def _write_tables(db: sqlite3.Connection, kiss: Kiss):
+    cat_routes = kiss.cat_routes
+    stations, airports = kiss.rail.nodes, kiss.fly.nodes
+    regions = kiss.regions
+    codes = stations.codes
+
+    def route_json(route):
+        return json.dumps([codes[i] for i in route])
+
+    db.execute("PRAGMA journal_mode = OFF")
+    db.execute("PRAGMA synchronous = OFF")
+    db.executescript(SCHEMA)
+    with db:  # one transaction for all inserts
+        db.execute("INSERT INTO params VALUES (?, ?)", ("max_duration", kiss.max_duration))
+        db.executemany("INSERT INTO stations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+            (i, code, kiss.rail.stations_by_id[i].name, str(stations.type[i]),
+             int(stations.in_graph[i]), _optional(stations.lat[i], float),
+             _optional(stations.long[i], float), str(regions["region"][i]),
+             int(regions["component"][i]))
+            for i, code in enumerate(codes)))
+
+        airport_station = {airport.code: station.id
+                           for airport, station in kiss.airport_to_station.items()}
+        db.executemany("INSERT INTO airports VALUES (?, ?, ?, ?, ?, ?, ?)", (
+            (i, code, _optional(kiss.fly.airports[code].city, str),
+             _optional(kiss.fly.airports[code].ctry, str), float(airports.lat[i]),
+             float(airports.long[i]), airport_station.get(code))
+            for i, code in enumerate(airports.codes)))
+
+        db.executemany("INSERT INTO rail_edges VALUES (?, ?, ?, ?, ?)", (
+            (source, target, int(data["weight"]), _optional(data.get("dist"), float),
+             _optional(data.get("speed"), float))
+            for source, target, data in kiss.rail.graph.edges(data=True)))
+
+        db.executemany("INSERT INTO unnecessary_links VALUES (?, ?, ?, ?, ?, ?)", (
+            (line.source.id, line.target.id, int(line.dur_short), int(line.dur_dir),
+             float(line.prop_longer), route_json(line.route))
+            for line in kiss.rail.unnecessary_links.itertuples()))
+
+        db.executemany("INSERT INTO cat_routes VALUES "
+                       "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", zip(
+                           cat_routes.orig_id.astype(int).tolist(),
+                           cat_routes.dest_id.astype(int).tolist(),
+                           cat_routes.pas.astype(int).tolist(),
+                           cat_routes.dist_fly.astype(int).tolist(),
+                           cat_routes.dur_fly.astype(int).tolist(),
+                           [None if i < 0 else i for i in cat_routes.orig_station_id.tolist()],
+                           [None if i < 0 else i for i in cat_routes.dest_station_id.tolist()],
+                           [_optional(dur, int) for dur in cat_routes.dur_rail],
+                           [_optional(speed, float)
+                            for speed in np.where(np.isinf(cat_routes.speed_rail), np.nan,
+                                                  cat_routes.speed_rail)],
+                           [None if route is None else route_json(route)
+                            for route in cat_routes.route],
+                           [_optional(err, str) for err in cat_routes.orig_err],
+                           [_optional(err, str) for err in cat_routes.dest_err],
+                           cat_routes.orig_region.astype(str).tolist(),
+                           cat_routes.dest_region.astype(str).tolist(),
+                           cat_routes.component.astype(int).tolist(),
+                       ))
+    db.executescript(INDEXES)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="export the categorized routes to SQLite")
+    parser.add_argument("--min-pas", type=int, default=1)
+    parser.add_argument("--max-duration", type=int, default=900)
+    parser.add_argument("--output", default=EXPORT_DB)
+    args = parser.parse_args()
+    export_sqlite(Kiss(Fly(args.min_pas), Rail(), max_duration=args.max_duration), args.output)
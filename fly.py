@@ -1,10 +1,13 @@
 import os
-from typing import Set, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
 
 import numpy as np
 import pandas as pd
 
+from claz import trace
 from claz.airport import Airport
+from claz.nodes import Nodes
 from claz.util import get_eu_map, load_pickle, dump_pickle, Karte
 
 COORDS_PICKLE = 'coords.pickle'
@@ -13,13 +16,51 @@ DATA_DIR = 'data'
 TIMES = ["2019Q2 ", "2019Q1 ", "2018Q4 ", "2018Q3 "]
 LAT_RANGE = (35.0, 65.0)  # y-axis
 LONG_RANGE = (-11.0, 39.0)  # x-axis
+PASSENGER_COLUMNS = ['orig', 'dest', 'pas']
+COORD_COLUMNS = ["lat", "long", "city", "ctry"]  # lat is y-axis, long is x-axis: 50N, 10E
+
+
+def _read_passenger_file(file_path) -> pd.DataFrame:
+    """
+    parses one country tsv into the orig, dest and pas columns, the codes as categoricals.
+    this is module level, so that it can be sent to the worker processes.
+    """
+    def retrieve_value(line):
+        _, type_, route = line.iloc[0].split(',')
+        country1, code1, country2, code2 = route.split("_")
+        if type_ != "PAS_BRD":  # passengers boarding in both directions
+            return pd.Series((None, None, None))
+        for time in TIMES:
+            try:
+                value = line[time]
+                if value.strip() == ":":
+                    continue
+                return pd.Series((code1, code2, value))
+            except KeyError:
+                continue
+        return pd.Series((None, None, None))
+
+    country_code = file_path[-6:-4]
+    print(country_code, "reading file:", os.path.basename(file_path))
+    result = pd.read_csv(file_path, delimiter='\t', encoding='utf-8')
+    result = result.apply(retrieve_value, axis=1)
+    result.columns = PASSENGER_COLUMNS
+    result = result.dropna().reset_index(drop=True)  # drop entries that are not in TIMES
+    return result.astype({"orig": "category", "dest": "category", "pas": int})
 
 
 class Fly:
     SPEED = 800  # km/h
     ADD_TIME = 30  # min
 
-    def __init__(self, min_pas=None, *, renew=False):
+    @staticmethod
+    def flight_duration(dist):
+        """
+        pure flight time in min for a distance in m, without ADD_TIME
+        """
+        return dist / 1000 / Fly.SPEED * 60
+
+    def __init__(self, min_pas=None, *, renew=False, workers=None):
         # code -> (lat, long, city, ctry)
         self.airport_coords = Fly._load_coords(renew=renew)
         # {airport_code1, airport_code2, ...}
@@ -28,11 +69,14 @@ class Fly:
         # ['orig', 'dest', 'pas',
         #  "orig_lat", "orig_long", "orig_city", "orig_ctry",
         #  "dest_lat", "dest_long", "dest_city", "dest_ctry"]
-        self.all_passenger_data = self._load_all_passenger_data(renew=renew)
+        # workers > 1 parses the country files in a process pool
+        self.all_passenger_data = self._load_all_passenger_data(renew=renew, workers=workers)
 
         self.passenger_data: pd.DataFrame = pd.DataFrame()
         # ctry, city, code, lat, long
         self.airports: Dict[str, Airport] = {}
+        # ids, coordinates of self.airports
+        self.nodes = Nodes([], type_="A")
         if min_pas is not None:
             self.get_european_flights(min_pas)
 
@@ -50,60 +94,48 @@ class Fly:
         dump_pickle(COORDS_PICKLE, coords)
         return coords
 
-    def _load_all_passenger_data(self, *, renew=False) -> pd.DataFrame:
-        def retrieve_value(line):
-            _, type_, route = line[0].split(',')
-            country1, code1, country2, code2 = route.split("_")
-            if type_ != "PAS_BRD":  # passengers boarding in both directions
-                return pd.Series((None, None, None))
-            for time in TIMES:
-                try:
-                    value = line[time]
-                    if value.strip() == ":":
-                        continue
-                    return pd.Series((code1, code2, value))
-                except KeyError:
-                    continue
-            return pd.Series((None, None, None))
-
-        def add_coords(line: pd.Series):
-            try:
-                orig = self.airport_coords[line.orig]
-                dest = self.airport_coords[line.dest]
-            except KeyError:
-                self.unknown_coords.add(line.orig)
-                self.unknown_coords.add(line.dest)
-                orig = (0, 0, None, None)
-                dest = (0, 0, None, None)
-            return line.append(pd.Series(orig + dest, index=[
-                "orig_lat", "orig_long", "orig_city", "orig_ctry",
-                "dest_lat", "dest_long", "dest_city", "dest_ctry"
-            ]))  # lat is y-axis, long is x-axis, normal format: 50N, 10E
-
-        columns = ['orig', 'dest', 'pas']
-
+    @trace.timed()
+    def _load_all_passenger_data(self, *, renew=False, workers=None) -> pd.DataFrame:
         if not renew and os.path.exists(DATA_PICKLE):
-            return load_pickle(DATA_PICKLE)
-
-        all_passenger_data = pd.DataFrame({name: [] for name in columns})
-        for filename in [f for f in os.listdir(DATA_DIR) if f.endswith('.tsv')]:
-            country_code = filename[-6:-4]
-            print(country_code, "reading file:", filename)
-            result = pd.read_csv(os.path.join(DATA_DIR, filename), delimiter='\t',
-                                 encoding='utf-8')
-            result = result.apply(retrieve_value, axis=1)
-            result.columns = columns
-            result = result.dropna()  # drop entries that are not in TIMES
-            result.pas = result.pas.astype(int)
-            all_passenger_data = all_passenger_data.append(result, ignore_index=True)
-
-        print("start mapping coords to airport codes...")
-        all_passenger_data = all_passenger_data.apply(add_coords, axis=1)
+            all_passenger_data = load_pickle(DATA_PICKLE)
+            trace.count("rows", len(all_passenger_data))
+            return all_passenger_data
+
+        # sorted, so that the row order doesn't depend on the file system
+        file_paths = [os.path.join(DATA_DIR, f) for f in sorted(os.listdir(DATA_DIR))
+                      if f.endswith('.tsv')]
+        if workers is not None and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map() yields the results in the order of file_paths
+                results = list(executor.map(_read_passenger_file, file_paths))
+        else:
+            results = [_read_passenger_file(file_path) for file_path in file_paths]
+        all_passenger_data = self._join_coords(
+            pd.concat(results, ignore_index=True).astype({"orig": object, "dest": object}))
 
         dump_pickle(DATA_PICKLE, all_passenger_data)
+        trace.count("files", len(file_paths))
+        trace.count("rows", len(all_passenger_data))
         print("Saved passenger data to", DATA_PICKLE, "number of rows:", len(all_passenger_data))
         return all_passenger_data
 
+    def _join_coords(self, passenger_data: pd.DataFrame) -> pd.DataFrame:
+        # if one of both airports is unknown, both get (0, 0, None, None)
+        airport_coords = pd.DataFrame.from_dict(self.airport_coords, orient="index",
+                                                columns=COORD_COLUMNS)
+        known = (passenger_data.orig.isin(airport_coords.index)
+                 & passenger_data.dest.isin(airport_coords.index))
+        self.unknown_coords.update(passenger_data.orig[~known])
+        self.unknown_coords.update(passenger_data.dest[~known])
+        for mode in ["orig", "dest"]:
+            coords = airport_coords.reindex(passenger_data[mode]).reset_index(drop=True)
+            coords[["lat", "long"]] = coords[["lat", "long"]].where(known, 0)
+            coords[["city", "ctry"]] = coords[["city", "ctry"]].astype(object).where(known, None)
+            passenger_data[[f"{mode}_{column}" for column in COORD_COLUMNS]] = \
+                coords[COORD_COLUMNS]
+        return passenger_data
+
+    @trace.timed()
     def get_european_flights(self, min_amount):
         print(f"start filtering of {len(self.all_passenger_data)} passenger data rows...")
         filtered_data = self.all_passenger_data[self.all_passenger_data.pas > min_amount]
@@ -116,22 +148,39 @@ class Fly:
         filtered_data = filtered_data[LONG_RANGE[0] < filtered_data.dest_long]
         filtered_data = filtered_data[filtered_data.dest_long < LONG_RANGE[1]]
 
-        def extract_airports(line: pd.Series):
-            dist = Karte.distance(line.orig_lat, line.orig_long, line.dest_lat, line.dest_long)
-            duration = Fly.ADD_TIME + dist / (Fly.SPEED / 1000 * 60)  # dur in min, dist in m
-            return pd.Series((
-                Airport(line.orig_ctry, line.orig_city, line.orig, line.orig_lat, line.orig_long),
-                Airport(line.dest_ctry, line.dest_city, line.dest, line.dest_lat, line.dest_long),
-                int(line.pas), int(dist), int(duration)
-            ), index=["orig_fly", "dest_fly", "pas", "dist_fly", "dur_fly"])
-
-        self.passenger_data = filtered_data.apply(extract_airports, axis=1)
-        airports_: Set[Airport] = set()
-        airports_.update(list(self.passenger_data.orig_fly))
-        airports_.update(list(self.passenger_data.dest_fly))
-        self.airports = {airport.code: airport for airport in airports_}
+        # one Airport view per code, the first occurrence provides city and country
+        self.nodes = Nodes(list(filtered_data.orig) + list(filtered_data.dest), type_="A")
+        orig_ids = self.nodes.id_array(filtered_data.orig)
+        dest_ids = self.nodes.id_array(filtered_data.dest)
+        self.nodes.lat[dest_ids] = filtered_data.dest_lat
+        self.nodes.long[dest_ids] = filtered_data.dest_long
+        self.nodes.lat[orig_ids] = filtered_data.orig_lat
+        self.nodes.long[orig_ids] = filtered_data.orig_long
+        airports_: Dict[str, Airport] = {}
+        for mode in ["orig", "dest"]:
+            for ctry, city, code in zip(filtered_data[f"{mode}_ctry"],
+                                        filtered_data[f"{mode}_city"], filtered_data[mode]):
+                if code not in airports_:
+                    airports_[code] = Airport(ctry, city, code, self.nodes)
+        airport_list = [airports_[code] for code in self.nodes.codes]
+
+        dist = Karte.distance(self.nodes.lat[orig_ids], self.nodes.long[orig_ids],
+                              self.nodes.lat[dest_ids], self.nodes.long[dest_ids])
+        duration = Fly.ADD_TIME + Fly.flight_duration(dist)  # dur in min, dist in m
+        self.passenger_data = pd.DataFrame({
+            "orig_fly": [airport_list[i] for i in orig_ids],
+            "dest_fly": [airport_list[i] for i in dest_ids],
+            "pas": filtered_data.pas.astype(int),
+            "dist_fly": np.asarray(dist).astype(int),
+            "dur_fly": np.asarray(duration).astype(int),
+            "orig_id": orig_ids,
+            "dest_id": dest_ids,
+        }, index=filtered_data.index)
+        self.airports = airports_
+        trace.count("rows", len(self.passenger_data))
+        trace.count("airports", len(self.airports))
         print(f"we have {len(self.passenger_data)} plane routes "
-              f"between {len(airports_)} European airports.")
+              f"between {len(self.airports)} European airports.")
 
     def draw_airports(self, draw_names=True, random_color=False, draw_lines=False):
         import cartopy.crs as ccrs
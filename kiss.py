@@ -1,89 +1,215 @@
-from typing import Dict, List
+import hashlib
+from typing import Dict, List, Tuple, Any, Callable
 
 import commentjson
+import networkx as nx
+import numpy as np
 import pandas as pd
 
+from claz import trace
 from claz.airport import Airport
+from claz.door import DoorToDoor, DoorToDoorBase
 from claz.station import Station
-from claz.util import Karte
+from claz.util import Karte, cached, hash_key, hash_file, STAGE_VERSION
 from fly import Fly
 from rail import Rail
 
+MAPPING_NAMES_JSON = "rail/mapping_names.json"
+STATION_COORDS_JSON = "rail/station_coords.json"
+AIRPORT2STATION_JSON = "airport2station.json"
+
 
 class Kiss:
+    """
+    the Fly -> Rail -> mapping -> categorisation -> statistics flow as lazy stages.
+    each stage is evaluated on first access and its result is cached in CACHE_DIR,
+    addressed by the hashes of its inputs, so only stages with changed inputs are redone.
+    """
     def __init__(self, fly: Fly, rail: Rail, max_duration=900):
         self.fly = fly
         self.rail = rail
         self.max_duration = max_duration
-        self.station_to_airports, self.airport_to_station = self._map_station_airport()
-        self.add_distance_data_to_rail_graph()
+        # in memory results of the stages and input keys, see _memoize
+        self._memo: Dict[Tuple, Any] = {}
+
+    def _memoize(self, key: Tuple, compute: Callable[[], Any]):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def _stage(self, stage: str, key: str, compute: Callable[[], Any]):
+        def load_or_compute():
+            with trace.span(f"stage:{stage}"):
+                return cached(stage, key, compute)
+        return self._memoize((stage, key), load_or_compute)
+
+    @property
+    def _fly_key(self) -> str:
+        # content hash of passenger_data on every access, so in place edits are picked up.
+        # the airport views are left out, they follow from the ids and fly.nodes.codes
+        data = self.fly.passenger_data.drop(columns=["orig_fly", "dest_fly"], errors="ignore")
+        return hash_key(hashlib.sha1(pd.util.hash_pandas_object(data).values.tobytes()).hexdigest(),
+                        self.fly.nodes.codes)
+
+    @property
+    def _mapping_key(self) -> str:
+        return hash_key(STAGE_VERSION, self._fly_key, self.rail.key,
+                        hash_file(MAPPING_NAMES_JSON), hash_file(STATION_COORDS_JSON))
+
+    @property
+    def _categorisation_key(self) -> str:
+        return hash_key(STAGE_VERSION, self._mapping_key)
+
+    @property
+    def _mapping(self) -> Tuple[Dict[Station, List[Airport]], Dict[Airport, Station]]:
+        def restore():
+            # the cached mapping only holds codes, the objects are the ones of fly and rail
+            station_to_codes = self._stage("mapping", self._mapping_key, self._map_station_airport)
+            station_to_airports: Dict[Station, List[Airport]] = {}
+            for station in self.rail.station_list:
+                station_to_airports[station] = [self.fly.airports[airport_code] for airport_code
+                                                in station_to_codes[station.code]]
+            airport_to_station: Dict[Airport, Station] = {
+                airport: station
+                for station, airports in station_to_airports.items()
+                for airport in airports
+            }
+            return station_to_airports, airport_to_station
+        return self._memoize(("mapping_objects", self._mapping_key), restore)
+
+    @property
+    def station_to_airports(self) -> Dict[Station, List[Airport]]:
+        return self._mapping[0]
+
+    @property
+    def airport_to_station(self) -> Dict[Airport, Station]:
+        return self._mapping[1]
+
+    @property
+    def cat_routes(self) -> pd.DataFrame:
+        def attach():
+            # the cached stage only holds ids, the Airport and Station views in here are the
+            # live ones of fly and rail, never detached copies from a pickle
+            categories = self._stage("categorisation", self._categorisation_key,
+                                     self.calc_categorized_connections)
+            stations = self.rail.stations_by_id
+            views = pd.DataFrame({
+                f"{mode}_rail": [stations[i] if i >= 0 else None
+                                 for i in categories[f"{mode}_station_id"]]
+                for mode in ["orig", "dest"]
+            }, index=categories.index)
+            return pd.concat([self.fly.passenger_data, views, categories], axis=1)
+        return self._memoize(("cat_routes", self._categorisation_key), attach)
+
+    @property
+    def _statistics(self) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        # cheaper to recompute than to load, so this stage is only kept in memory
+        return self._memoize(("statistics", self._categorisation_key, self.max_duration),
+                             self._calc_statistics)
 
-        self.cat_routes = self.calc_categorized_connections()
-        self.cat_routes_split_sorted: Dict[str, pd.DataFrame] = {}
-        self.routes: pd.DataFrame = self.statistics()
+    @property
+    def routes(self) -> pd.DataFrame:
+        return self._statistics[0]
+
+    @property
+    def cat_routes_split_sorted(self) -> Dict[str, pd.DataFrame]:
+        return self._statistics[1]
 
-    def _map_station_airport(self):
+    def _map_station_airport(self) -> Dict[str, List[str]]:
         airports_by_simple_name: Dict[str, List[Airport]] = {}
         for airport in self.fly.airports.values():
             if airport.simple_name not in airports_by_simple_name:
                 airports_by_simple_name[airport.simple_name] = []
             airports_by_simple_name[airport.simple_name].append(airport)
 
-        with open("rail/mapping_names.json", "r") as f:
+        with open(MAPPING_NAMES_JSON, "r") as f:
             mapping_corrections: Dict[str, List[str]] = commentjson.load(f)
 
-        station_to_airports: Dict[Station, List[Airport]] = {}
+        station_to_airports: Dict[str, List[str]] = {}
         for station in self.rail.station_list:
             if station.code in mapping_corrections:
-                airport_codes = [airport_code for airport_code
-                                 in mapping_corrections[station.code]]
-                station_to_airports[station] = []
-                for airport_code in airport_codes:
-                    try:
-                        station_to_airports[station].append(self.fly.airports[airport_code])
-                    except KeyError:
-                        continue  # this Airport was not important enough to make the cut.
+                # skip Airports that were not important enough to make the cut.
+                station_to_airports[station.code] = [
+                    airport_code for airport_code in mapping_corrections[station.code]
+                    if airport_code in self.fly.airports]
             elif station.simple_name in airports_by_simple_name:
-                station_to_airports[station] = airports_by_simple_name[station.simple_name]
+                station_to_airports[station.code] = [
+                    airport.code for airport in airports_by_simple_name[station.simple_name]]
             else:
-                station_to_airports[station] = []
-        airport_to_station: Dict[Airport, Station] = {
-            airport: station
-            for station, airports in station_to_airports.items()
-            for airport in airports
-        }
-        with open("airport2station.json", "w") as f:
-            commentjson.dump({airport.code: station.code for airport, station
-                              in airport_to_station.items()}, f)
+                station_to_airports[station.code] = []
+        return station_to_airports
 
-        return station_to_airports, airport_to_station
+    def write_airport2station(self, file_path=AIRPORT2STATION_JSON):
+        with open(file_path, "w") as f:
+            commentjson.dump({airport.code: station.code
+                              for airport, station in self.airport_to_station.items()}, f)
 
     @property
     def present_station_to_airports(self):
         return [(station, airports) for station, airports
                 in self.station_to_airports.items() if station.in_graph]
 
+    @staticmethod
+    def _load_station_coords() -> Dict[str, Tuple[float, float]]:
+        # station code -> (lat, long) of the actual station
+        with open(STATION_COORDS_JSON, "r") as f:
+            return {code: tuple(coords) for code, coords in commentjson.load(f).items()}
+
+    def _calc_station_coords(self) -> Tuple[np.ndarray, np.ndarray]:
+        station_coords = Kiss._load_station_coords()
+        # station coordinates by station id, the mean of the mapped airports if not listed
+        lat = np.full(len(self.rail.nodes), np.nan)
+        long = np.full(len(self.rail.nodes), np.nan)
+        for station, airports in self.station_to_airports.items():
+            if station.code in station_coords:
+                lat[station.id], long[station.id] = station_coords[station.code]
+            elif airports:
+                airport_ids = [airport.id for airport in airports]
+                lat[station.id] = self.fly.nodes.lat[airport_ids].mean()
+                long[station.id] = self.fly.nodes.long[airport_ids].mean()
+        return lat, long
+
+    def _calc_distance_data(self):
+        lat, long = self._calc_station_coords()
+        # source id, target id, duration of all edges
+        edges = np.array(list(self.rail.graph.edges.data('weight')), dtype=np.int64).reshape(-1, 3)
+        sources, targets, durations = edges.T
+        dist = np.asarray(Karte.distance(lat[sources], long[sources], lat[targets], long[targets]))
+        return lat, long, sources, targets, dist, dist / 1000 / durations * 60
+
     def add_distance_data_to_rail_graph(self):
-        no_airport_coords = {
-            "aar": (56.162939, 10.203921),
-            "ant": (51.2194475, 4.4024643),
-            "bia": (53.1324886, 23.1688403),
-            "dau": (55.88333, 26.53333),
-            "mah": (49.4874592, 8.4660395),
-            "brs": (52.097622, 23.734051)
-        }
-        for station, airports in self.present_station_to_airports:
-            if station.code in no_airport_coords:
-                station.lat, station.long = no_airport_coords[station.code]
-            else:
-                lats, longs = list(zip(*[(airport.lat, airport.long) for airport in airports]))
-                station.loc_mean(lats, longs)
+        def apply():
+            lat, long, sources, targets, dist, speed = self._stage(
+                "distance", self._mapping_key, self._calc_distance_data)
+            located = ~np.isnan(lat)
+            self.rail.nodes.lat[located] = lat[located]
+            self.rail.nodes.long[located] = long[located]
+            edges = list(zip(sources.tolist(), targets.tolist()))
+            nx.set_edge_attributes(self.rail.graph, dict(zip(edges, dist.tolist())), "dist")
+            nx.set_edge_attributes(self.rail.graph, dict(zip(edges, speed.tolist())), "speed")
+        self._memoize(("distance_applied", self._mapping_key), apply)
+
+    EAST_LONG = 15.0  # roughly the old east west border
+    NORTH_LAT = 56.0  # roughly Scandinavia and the Baltics
+
+    @staticmethod
+    def region_of(lat: np.ndarray, long: np.ndarray) -> np.ndarray:
+        return np.where(np.isnan(lat), Kiss.UNKNOWN_REGION,
+                        np.where(lat >= Kiss.NORTH_LAT, Kiss.NORTH,
+                                 np.where(long >= Kiss.EAST_LONG, Kiss.EAST, Kiss.WEST)))
 
-        for source_code, target_code, duration in self.rail.graph.edges.data('weight'):
-            source, target = self.rail.stations[source_code], self.rail.stations[target_code]
-            dist = Karte.distance(source.lat, source.long, target.lat, target.long)
-            self.rail.graph[source_code][target_code]["dist"] = dist
-            self.rail.graph[source_code][target_code]["speed"] = dist / 1000 / duration * 60
+    def _calc_regions(self) -> Dict[str, np.ndarray]:
+        lat, long = self._calc_station_coords()
+        region = Kiss.region_of(lat, long)
+        region[self.rail.nodes.type == "I"] = Kiss.ISLANDS
+        return {"region": region, "component": self.rail.component_ids()}
+
+    @property
+    def regions(self) -> Dict[str, np.ndarray]:
+        """
+        region label and connected component for each station id
+        """
+        return self._stage("regions", self._mapping_key, self._calc_regions)
 
     @property
     def unmapped_stations(self):
@@ -98,58 +224,100 @@ class Kiss:
     TOO_LONG = "too_long"
     SHORT_ENOUGH = "short_enough"
 
+    WEST = "west"
+    EAST = "east"
+    NORTH = "north"
+    ISLANDS = "islands"
+    UNKNOWN_REGION = "unknown"
+    REGION = "region"
+    COMPONENT = "component"
+
+    def _airport_station_ids(self) -> np.ndarray:
+        """
+        airport id -> station id, -1 if the airport isn't mapped to a station
+        """
+        airport_station = np.full(len(self.fly.nodes), -1, dtype=np.intp)
+        for airport, station in self.airport_to_station.items():
+            airport_station[airport.id] = station.id
+        return airport_station
+
+    @trace.timed()
     def calc_categorized_connections(self) -> pd.DataFrame:
-
-        def find_route(line):
-            index = ["orig_rail", "dest_rail", "dur_rail", "speed_rail", "route",
-                     "orig_err", "dest_err"]
-            orig_station, dest_station = None, None
-
-            def error_line(is_orig: bool, is_dest: bool, value: str):
-                return line.append(pd.Series(
-                    (orig_station, dest_station, None, None, None,
-                     (value if is_orig else False),
-                     (value if is_dest else False)),
-                    index=index
-                ))
-
-            try:
-                orig_station = self.airport_to_station[line.orig_fly]
-                dest_station = self.airport_to_station[line.dest_fly]
-            except KeyError:
-                return error_line(
-                    line.orig_fly not in self.airport_to_station,
-                    line.dest_fly not in self.airport_to_station, Kiss.UNMAPPED)
-            try:
-                duration, route = self.rail.travel_times[orig_station][dest_station]
-                # duration is in min, dist in meters, speed in km/h
-                speed = line.dist_fly / 1000 / duration * 60
-            except KeyError:
-                if orig_station.type in ["N", "C"] or dest_station.type in ["N", "C"]:
-                    return error_line(orig_station.type in ["N", "C"],
-                                      dest_station.type in ["N", "C"], Kiss.NO_RAIL)
-                if orig_station.type == "I" or dest_station.type == "I":
-                    return error_line(orig_station.type == "I",
-                                      dest_station.type == "I", Kiss.ISLAND)
-                if not orig_station.in_graph or not dest_station.in_graph:
-                    # this is the case if the connections json doesn't provide any data here
-                    return error_line(not orig_station.in_graph,
-                                      not dest_station.in_graph, Kiss.NOT_IN_GRAPH)
-
-                return error_line(True, True, Kiss.NO_CONNECTION)
-            return line.append(pd.Series(
-                (orig_station, dest_station, duration, speed, route, False, False), index=index
-            ))
-
         passengers = self.fly.passenger_data
         print(f"analyzing the plane connections...")
-        return passengers.apply(find_route, axis=1)
+        trace.count("rows", len(passengers))
+        nodes, regions = self.rail.nodes, self.regions
+
+        airport_station = self._airport_station_ids()
+        orig = airport_station[passengers.orig_id.to_numpy()]
+        dest = airport_station[passengers.dest_id.to_numpy()]
+
+        # everything is classified with masks over the station ids
+        unmapped_orig, unmapped_dest = orig < 0, dest < 0
+        mapped = ~unmapped_orig & ~unmapped_dest
+        orig, dest = np.maximum(orig, 0), np.maximum(dest, 0)  # masked below anyway
+        component = regions["component"]
+        reachable = mapped & (component[orig] >= 0) & (component[orig] == component[dest])
+        unreachable = mapped & ~reachable
+        no_rail_orig = np.isin(nodes.type[orig], ["N", "C"])
+        no_rail_dest = np.isin(nodes.type[dest], ["N", "C"])
+        no_rail = unreachable & (no_rail_orig | no_rail_dest)
+        island_orig, island_dest = nodes.type[orig] == "I", nodes.type[dest] == "I"
+        island = unreachable & ~no_rail & (island_orig | island_dest)
+        # this is the case if the connections json doesn't provide any data here
+        out_orig, out_dest = ~nodes.in_graph[orig], ~nodes.in_graph[dest]
+        not_in_graph = unreachable & ~no_rail & ~island & (out_orig | out_dest)
+        no_connection = unreachable & ~no_rail & ~island & ~not_in_graph
+
+        orig_err = np.full(len(passengers), False, dtype=object)
+        dest_err = np.full(len(passengers), False, dtype=object)
+        for err_type, both, is_orig, is_dest in [
+            (Kiss.UNMAPPED, ~mapped, unmapped_orig, unmapped_dest),
+            (Kiss.NO_RAIL, no_rail, no_rail_orig, no_rail_dest),
+            (Kiss.ISLAND, island, island_orig, island_dest),
+            (Kiss.NOT_IN_GRAPH, not_in_graph, out_orig, out_dest),
+            (Kiss.NO_CONNECTION, no_connection, True, True),
+        ]:
+            orig_err[both & is_orig] = err_type
+            dest_err[both & is_dest] = err_type
+
+        dur_rail = np.full(len(passengers), np.nan)
+        route = np.full(len(passengers), None, dtype=object)
+        for i in np.flatnonzero(reachable):
+            dur_rail[i], route[i] = self.rail.travel_times[orig[i]][dest[i]]
+        # duration is in min, dist in meters, speed in km/h
+        with np.errstate(divide="ignore"):
+            speed_rail = passengers.dist_fly.to_numpy() / 1000 / dur_rail * 60
+
+        # regions of unmapped airports come from the airport itself
+        airport_region = Kiss.region_of(self.fly.nodes.lat, self.fly.nodes.long)
+        # no Airport or Station objects in here, see cat_routes
+        return pd.DataFrame(dict(
+            orig_station_id=np.where(unmapped_orig, -1, orig),
+            dest_station_id=np.where(mapped, dest, -1),
+            dur_rail=dur_rail,
+            speed_rail=speed_rail,
+            route=route,
+            orig_err=orig_err,
+            dest_err=dest_err,
+            orig_region=np.where(unmapped_orig, airport_region[passengers.orig_id.to_numpy()],
+                                 regions["region"][orig]),
+            dest_region=np.where(unmapped_dest, airport_region[passengers.dest_id.to_numpy()],
+                                 regions["region"][dest]),
+            component=np.where(reachable, component[orig], -1),
+        ), index=passengers.index)
 
     @staticmethod
     def accumulate_pas(routes_):
         return "{:.1f}M".format(sum(routes_["pas"]) / 1000000)
 
     def statistics(self, *, show_where_to_add_data=False):
+        result = self._calc_statistics(show_where_to_add_data=show_where_to_add_data)
+        self._memo[("statistics", self._categorisation_key, self.max_duration)] = result
+        return result[0]
+
+    def _calc_statistics(self, *, show_where_to_add_data=False):
+        cat_routes_split_sorted: Dict[str, pd.DataFrame] = {}
         routes = self.cat_routes.dropna()
         r = {
             "valid": routes,
@@ -180,27 +348,89 @@ class Kiss:
             print(f"- {len(r[err_type]['both'])} \t| {Kiss.accumulate_pas(r[err_type]['both'])}:\t"
                   f" {descriptions[err_type]} ({err_type})")
             mode = 'fly' if err_type in [Kiss.UNMAPPED, Kiss.NO_RAIL, Kiss.ISLAND] else 'rail'
-            self.cat_routes_split_sorted[err_type] = sort_agg(r[err_type]["orig"], mode)
+            cat_routes_split_sorted[err_type] = sort_agg(r[err_type]["orig"], mode)
 
         print("--------+---------")
         print(f"= {len(r['valid'])} \t| {Kiss.accumulate_pas(r['valid'])}:\t"
               f"have (possibly long) train connections")
         print(f"* {len(r[Kiss.SHORT_ENOUGH])} \t| {Kiss.accumulate_pas(r[Kiss.SHORT_ENOUGH])}:\t"
               f"convertible to (night) trains below {self.max_duration} min")
-        self.cat_routes_split_sorted[Kiss.TOO_LONG] = sort_agg(r[Kiss.TOO_LONG], "rail")
+        cat_routes_split_sorted[Kiss.TOO_LONG] = sort_agg(r[Kiss.TOO_LONG], "rail")
+
+        # breakdowns of all flights and the convertible ones by region pair and rail component
+        for breakdown, by in [(Kiss.REGION, ["orig_region", "dest_region"]),
+                              (Kiss.COMPONENT, ["component"])]:
+            cat_routes_split_sorted[breakdown] = pd.concat([
+                self.cat_routes.groupby(by).agg(pas=("pas", "sum"), count=("pas", "count")),
+                r[Kiss.SHORT_ENOUGH].groupby(by).agg(pas_short_enough=("pas", "sum")),
+            ], axis=1).fillna(0).sort_values("pas", ascending=False)
 
         if show_where_to_add_data:
             # print("These are the airports you should consider the most"
             #       "connecting to the railway network")
-            # print(self.cat_routes_split_sorted[Kiss.UNMAPPED].head(10))
+            # print(cat_routes_split_sorted[Kiss.UNMAPPED].head(10))
             print("These are the train stations that you should consider the most connecting.")
-            print(self.cat_routes_split_sorted[Kiss.NOT_IN_GRAPH].head(10))
+            print(cat_routes_split_sorted[Kiss.NOT_IN_GRAPH].head(10))
 
             print("These are the cities that cause most too long non-night-trainable flights")
-            print(self.cat_routes_split_sorted[Kiss.TOO_LONG].head(20))
-        return routes
+            print(cat_routes_split_sorted[Kiss.TOO_LONG].head(20))
+
+            print("These are the region pairs with the most passengers")
+            print(cat_routes_split_sorted[Kiss.REGION].head(10))
+        return routes, cat_routes_split_sorted
 
-    def times_comparison(self):
+    @property
+    def door_to_door_base(self) -> DoorToDoorBase:
+        return self._memoize(("door_to_door_base", self._categorisation_key),
+                             self._calc_door_to_door_base)
+
+    def _calc_door_to_door_base(self) -> DoorToDoorBase:
+        cat_routes = self.cat_routes
+        station_lat, station_long = self._memoize(("station_coords", self._mapping_key),
+                                                  self._calc_station_coords)
+        airport_station = self._airport_station_ids()
+        # STATION_COORDS_JSON covers the stations in the graph, the others are only
+        # placed at their airports, which would make their access distance 0
+        located = np.isin(self.rail.nodes.codes, list(Kiss._load_station_coords()))
+
+        def access(airport_ids: np.ndarray) -> np.ndarray:
+            # distance in km from the airports to their stations, NaN if not located
+            station_ids = airport_station[airport_ids]
+            mapped = station_ids >= 0
+            mapped[mapped] = located[station_ids[mapped]]
+            dist = np.full(len(airport_ids), np.nan)
+            dist[mapped] = Karte.distance(
+                self.fly.nodes.lat[airport_ids[mapped]], self.fly.nodes.long[airport_ids[mapped]],
+                station_lat[station_ids[mapped]], station_long[station_ids[mapped]])
+            return dist / 1000
+
+        orig_ids, dest_ids = cat_routes.orig_id.to_numpy(), cat_routes.dest_id.to_numpy()
+        ctry_orig, countries = pd.factorize(
+            pd.Series([str(airport.ctry) for airport in cat_routes.orig_fly]))
+        # the stations between the first and the last one of each route
+        transfer_rows, transfer_stations = [], []
+        for row, route in enumerate(cat_routes.route):
+            if route is not None:
+                transfer_stations.extend(route[1:-1])
+                transfer_rows.extend([row] * len(route[1:-1]))
+        return DoorToDoorBase(
+            index=cat_routes.index,
+            flight=Fly.flight_duration(cat_routes.dist_fly.to_numpy()),
+            dur_rail=cat_routes.dur_rail.to_numpy(dtype=float),
+            access_orig=access(orig_ids), access_dest=access(dest_ids),
+            ctry_orig=ctry_orig, countries=list(countries),
+            transfer_rows=np.array(transfer_rows, dtype=np.intp),
+            transfer_stations=np.array(transfer_stations, dtype=np.intp),
+            station_codes=self.rail.nodes.codes)
+
+    def door_to_door(self, model: DoorToDoor = None) -> pd.DataFrame:
+        """
+        door to door durations of all cat_routes under model. only the model's parameters
+        are applied here, so trying out many models is cheap.
+        """
+        return (model or DoorToDoor()).evaluate(self.door_to_door_base)
+
+    def times_comparison(self, model: DoorToDoor = None):
         buckets = {}
         for duration in range(100, 2100, 100):
             routes_bucket = self.routes[self.routes.dur_rail <= duration]
@@ -211,33 +441,28 @@ class Kiss:
         # hist = routes[["dur_rail", "pas"]].hist()
         print(buckets)
 
-        def add_dur_difs(line):
-            return line.append(pd.Series([
-                round(line.dur_rail / line.dur_fly, 2),
-                line.dur_rail - line.dur_fly,
-            ], index=["dur_dif_prop", "dur_dif_abs"]))
-
-        dur_difs: pd.DataFrame = self.routes.apply(add_dur_difs, axis=1)
+        dur_difs: pd.DataFrame = self.routes.assign(
+            dur_dif_prop=(self.routes.dur_rail / self.routes.dur_fly).round(2),
+            dur_dif_abs=self.routes.dur_rail - self.routes.dur_fly,
+        ).join(self.door_to_door(model))
         dur = {
-            "most_prop": dur_difs.sort_values("dur_dif_prop")
+            "most_prop": dur_difs.sort_values("dur_dif_prop"),
+            "most_prop_d2d": dur_difs.sort_values("d2d_dif_prop"),
         }
 
+    @trace.timed()
     def draw(self):
+        self.add_distance_data_to_rail_graph()
         karte = Karte(figsize=(8, 6))
         for station, airports in self.present_station_to_airports:
             karte.point(station.lat, station.long, text=station.code)
 
-        speeds = []
-        lat1s, long1s, lat2s, long2s = [], [], [], []
-        for source_code, target_code, speed in self.rail.graph.edges.data('speed'):
-            source = self.rail.stations[source_code]
-            target = self.rail.stations[target_code]
-            lat1s.append(source.lat)
-            long1s.append(source.long)
-            lat2s.append(target.lat)
-            long2s.append(target.long)
-            speeds.append(speed)
-        karte.lines(lat1s, long1s, lat2s, long2s,
+        sources, targets, speeds = zip(*self.rail.graph.edges.data('speed'))
+        sources, targets = np.array(sources), np.array(targets)
+        nodes = self.rail.nodes
+        trace.count("edges", len(speeds))
+        karte.lines(nodes.lat[sources], nodes.long[sources],
+                    nodes.lat[targets], nodes.long[targets],
                     colors=Karte.color_list(speeds, min_=50, max_=170))
         karte.show()
         print("done")
@@ -245,6 +470,7 @@ class Kiss:
 
 if __name__ == "__main__":
     k = Kiss(Fly(1), Rail())
+    k.write_airport2station()
     k.draw()
     k.times_comparison()
     print("done")
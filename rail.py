@@ -2,29 +2,45 @@ from typing import List, Dict, Tuple
 
 import commentjson
 import networkx as nx
+import numpy as np
 import pandas as pd
 
+from claz import trace
+from claz.nodes import Nodes
 from claz.station import Station
+from claz.util import cached, hash_key, hash_file, STAGE_VERSION
 
 TIMES_JSON = "rail/times.json"
 TIMES_JSON2 = "rail/times2.json"
+STATION_CODES_JSON = "rail/station_codes.json"
 
 
 class Rail:
     DURATION = "weight"
 
     def __init__(self):
-        with open("rail/station_codes.json", "r") as f:
-            self.station_list: List[Station] = [Station(station_name, station_code)
-                                                for station_name, station_code in
-                                                commentjson.load(f).items()]
-        self.stations: Dict[str, Station] = {station.code: station for station in self.station_list
-                                             if station.code is not None}
+        # content address of everything this Rail is built from
+        self.key = hash_key(STAGE_VERSION, hash_file(STATION_CODES_JSON),
+                            hash_file(TIMES_JSON), hash_file(TIMES_JSON2))
+        with open(STATION_CODES_JSON, "r") as f:
+            station_codes = [Station.resolve_code(station_name, station_code)
+                             for station_name, station_code in commentjson.load(f).items()]
+        # ids, coordinates, type and in_graph of all stations
+        self.nodes = Nodes([station_code for _, station_code, _ in station_codes])
+        self.station_list: List[Station] = [Station(station_name, station_code, type_, self.nodes)
+                                            for station_name, station_code, type_ in station_codes]
+        self.stations: Dict[str, Station] = {station.code: station
+                                             for station in self.station_list}
+        # id -> Station
+        self.stations_by_id: List[Station] = [self.stations[code] for code in self.nodes.codes]
+        # the nodes of the graph are the station ids
         self.graph: nx.Graph = self.create_network()
-        self.travel_times: Dict[
-            Station, Dict[Station, Tuple[int, List[Station]]]] = self.calc_travel_times()
+        # source id -> target id -> (duration, [source id, ..., target id])
+        self.travel_times: Dict[int, Dict[int, Tuple[int, List[int]]]] = cached(
+            "travel_times", self.key, self.calc_travel_times)
         self.unnecessary_links = self.find_unnecessary_links(remove=True)
 
+    @trace.timed()
     def create_network(self) -> nx.Graph:
         graph = nx.Graph()
         with open(TIMES_JSON, "r") as f:
@@ -41,16 +57,16 @@ class Rail:
         # 2.45 -> 2 hrs 45 mins
         def to_minutes(uvw):
             u, v, w = uvw
-            return u, v, int(w // 1 * 60 + w % 1 * 100)
+            return self.nodes.ids[u], self.nodes.ids[v], int(w // 1 * 60 + w % 1 * 100)
 
         times_in_mins = [to_minutes(time) for time in travel_times]
         graph.add_weighted_edges_from(times_in_mins)
 
-        stations_in_the_graph = list(nx.nodes(graph))
-        number_of_stations_in_graph = 0
-        for station_code, station in self.stations.items():
-            station.in_graph = station_code in stations_in_the_graph
-            number_of_stations_in_graph += int(station.in_graph)
+        self.nodes.in_graph[:] = False
+        self.nodes.in_graph[list(nx.nodes(graph))] = True
+        number_of_stations_in_graph = int(self.nodes.in_graph.sum())
+        trace.count("edges", graph.number_of_edges())
+        trace.count("stations", number_of_stations_in_graph)
         print(f"{number_of_stations_in_graph} of {len(self.stations)} train stations "
               f"are added to the graph.")
         return graph
@@ -58,35 +74,48 @@ class Rail:
     def connected_components(self):
         return nx.connected_components(self.graph)
 
+    def component_ids(self) -> np.ndarray:
+        """
+        the connected component of each station id, -1 if it is not in the graph.
+        components are numbered by size, so 0 is the mainland network.
+        """
+        component_ids = np.full(len(self.nodes), -1, dtype=np.intp)
+        components = sorted(self.connected_components(), key=lambda c: (-len(c), min(c)))
+        for component_id, station_ids in enumerate(components):
+            component_ids[list(station_ids)] = component_id
+        return component_ids
+
+    @trace.timed()
     def calc_travel_times(self):
-        times: Dict[Station, Dict[Station, Tuple[int, List[Station]]]] = {}
+        times: Dict[int, Dict[int, Tuple[int, List[int]]]] = {}
         # print("getting rail graph network lengths...")
-        for source_code, targets in nx.shortest_path(self.graph, weight=Rail.DURATION).items():
-            targets2 = {}
-            for target_code, route in targets.items():
-                length = sum([self.graph[route[n]][route[n + 1]][Rail.DURATION]
-                              for n in range(len(route) - 1)])
-                targets2[self.stations[target_code]] = (length, route)
-            times[self.stations[source_code]] = targets2
+        for source_id, (lengths, routes) in nx.all_pairs_dijkstra(self.graph,
+                                                                   weight=Rail.DURATION):
+            times[source_id] = {target_id: (lengths[target_id], route)
+                                for target_id, route in routes.items()}
+            trace.count("pairs", len(routes))
         return times
 
+    @trace.timed()
     def find_unnecessary_links(self, remove=True):
         columns = ["source", "target", "dur_short", "dur_dir", "prop_longer", "route"]
-        useless_links: List[Tuple[Station, Station, float, float, float, List[Station]]] = []
+        useless_links: List[Tuple[Station, Station, float, float, float, List[int]]] = []
         # unnecessary_links: List[Tuple[Station, Station, float, float, float, List[Station]]] = []
 
-        for source, targets in self.travel_times.items():
-            source_neighbors: Dict[str, Dict[str, float]] = dict(self.graph[source.code])
-            for target, (shortest_duration, route) in targets.items():
-                if len(route) < 3 or target.code not in source_neighbors:
+        for source_id, targets in self.travel_times.items():
+            source_neighbors: Dict[int, Dict[str, float]] = dict(self.graph[source_id])
+            for target_id, (shortest_duration, route) in targets.items():
+                if len(route) < 3 or target_id not in source_neighbors:
                     continue  # a direct route has 2 elements: [source, target]
-                direct_duration = source_neighbors[target.code][Rail.DURATION]
-                link = (source, target, shortest_duration, direct_duration,
+                direct_duration = source_neighbors[target_id][Rail.DURATION]
+                link = (self.stations_by_id[source_id], self.stations_by_id[target_id],
+                        shortest_duration, direct_duration,
                         direct_duration / shortest_duration, route)
                 if direct_duration > shortest_duration:
                     useless_links.append(link)
                     if remove:
-                        self.graph.remove_edge(source.code, target.code)
+                        self.graph.remove_edge(source_id, target_id)
+        trace.count("unnecessary_links", len(useless_links))
         if remove:
             print(f"Eliminated {len(useless_links)} direct links from the graph"
                   f"that have shorter alternatives")
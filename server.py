@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import json
+import math
+from functools import lru_cache
+from http import HTTPStatus
+from typing import Dict, List, Tuple, Any
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+
+from fly import Fly
+from kiss import Kiss
+from rail import Rail
+
+HOST = "127.0.0.1"
+PORT = 8642
+MAX_BODY = 1 << 20  # bytes, larger POST bodies are answered with 413
+
+
+class QueryService:
+    """
+    keeps Fly, Rail and Kiss warm in memory and answers OD, statistics and route queries.
+    GET  /od?orig=LFPG&dest=EDDM          -> the flights between two airports
+    POST /od  [["LFPG", "EDDM"], ...]     -> the same for a batch of pairs
+    GET  /stats?max_duration=600          -> routes and passengers convertible below a duration
+    GET  /route?orig=par&dest=mun         -> fastest rail route between two stations
+    """
+    def __init__(self, kiss: Kiss):
+        self.kiss = kiss
+        codes = kiss.rail.nodes.codes
+        # (orig airport code, dest airport code) -> [flight, ...]
+        self.od_index: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for line in kiss.cat_routes.itertuples():
+            flight = {
+                "orig": line.orig_fly.code, "dest": line.dest_fly.code, "pas": int(line.pas),
+                "dist_fly": int(line.dist_fly), "dur_fly": int(line.dur_fly),
+                "orig_rail": getattr(line.orig_rail, "code", None),
+                "dest_rail": getattr(line.dest_rail, "code", None),
+                "dur_rail": None if line.dur_rail != line.dur_rail else int(line.dur_rail),
+                "route": [codes[i] for i in line.route] if isinstance(line.route, list) else None,
+                "orig_err": line.orig_err or None, "dest_err": line.dest_err or None,
+            }
+            self.od_index.setdefault((flight["orig"], flight["dest"]), []).append(flight)
+
+        # sorted durations with cumulative passengers, so a threshold is a binary search
+        routes = kiss.routes.sort_values("dur_rail")
+        self.durations = routes.dur_rail.to_numpy(dtype=float)
+        self.cum_pas = np.cumsum(routes.pas.to_numpy(dtype=np.int64))
+        self.handle_get = lru_cache(maxsize=65536)(self._handle_get)
+        print(f"serving {len(self.od_index)} OD pairs and {len(self.durations)} rail routes")
+
+    def od(self, orig: str, dest: str) -> Dict[str, Any]:
+        return {"orig": orig, "dest": dest, "flights": self.od_index.get((orig, dest), [])}
+
+    def stats(self, max_duration: float) -> Dict[str, Any]:
+        n = int(np.searchsorted(self.durations, max_duration, side="right"))
+        return {"max_duration": max_duration, "routes": n,
+                "pas": int(self.cum_pas[n - 1]) if n else 0,
+                "valid_routes": len(self.durations),
+                "valid_pas": int(self.cum_pas[-1]) if len(self.cum_pas) else 0}
+
+    def route(self, orig: str, dest: str) -> Dict[str, Any]:
+        nodes = self.kiss.rail.nodes
+        orig_id, dest_id = nodes.ids[orig], nodes.ids[dest]  # KeyError for unknown stations
+        try:
+            duration, route = self.kiss.rail.travel_times[orig_id][dest_id]
+        except KeyError:
+            return {"orig": orig, "dest": dest, "dur_rail": None, "route": None}
+        return {"orig": orig, "dest": dest, "dur_rail": duration,
+                "route": [nodes.codes[i] for i in route]}
+
+    def _handle_get(self, target: str) -> Tuple[int, bytes]:
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+        try:
+            if url.path == "/od":
+                body = self.od(query["orig"], query["dest"])
+            elif url.path == "/stats":
+                max_duration = float(query.get("max_duration", self.kiss.max_duration))
+                if not math.isfinite(max_duration):
+                    raise ValueError("max_duration has to be a finite number")
+                body = self.stats(max_duration)
+            elif url.path == "/route":
+                body = self.route(query["orig"], query["dest"])
+            else:
+                return 404, b'{"error": "unknown path"}'
+        except KeyError as e:
+            return 404, json.dumps({"error": f"unknown or missing {e}"}).encode()
+        except ValueError as e:
+            return 400, json.dumps({"error": str(e)}).encode()
+        return 200, json.dumps(body).encode()
+
+    def handle_post(self, target: str, data: bytes) -> Tuple[int, bytes]:
+        if urlsplit(target).path != "/od":
+            return 404, b'{"error": "unknown path"}'
+        try:
+            pairs = json.loads(data)
+        except ValueError as e:
+            return 400, json.dumps({"error": str(e)}).encode()
+        if not isinstance(pairs, list) or not all(
+                isinstance(pair, list) and len(pair) == 2
+                and all(isinstance(code, str) for code in pair) for pair in pairs):
+            return 400, b'{"error": "expected a list of [orig, dest] airport code pairs"}'
+        return 200, json.dumps([self.od(orig, dest) for orig, dest in pairs]).encode()
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: int, body: bytes):
+        writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:  # keep-alive: several requests per connection
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                request = request_line.decode("latin-1").split()
+                if len(request) != 3:
+                    QueryService._respond(writer, 400, b'{"error": "malformed request line"}')
+                    await writer.drain()
+                    break
+                method, target, _ = request
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if method == "GET":
+                    status, body = self.handle_get(target)
+                elif method == "POST":
+                    try:
+                        length = int(headers.get("content-length", 0))
+                        if length < 0:
+                            raise ValueError(length)
+                    except ValueError:
+                        QueryService._respond(writer, 400, b'{"error": "bad content-length"}')
+                        await writer.drain()
+                        break
+                    if length > MAX_BODY:
+                        QueryService._respond(writer, 413, json.dumps(
+                            {"error": f"body larger than {MAX_BODY} bytes"}).encode())
+                        await writer.drain()
+                        break
+                    data = await reader.readexactly(length)
+                    status, body = self.handle_post(target, data)
+                else:
+                    status, body = 405, b'{"error": "method not allowed"}'
+                QueryService._respond(writer, status, body)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.serve_client, host, port)
+        print(f"listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="local query service for OD lookups")
+    parser.add_argument("--min-pas", type=int, default=1)
+    parser.add_argument("--max-duration", type=int, default=900)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    service = QueryService(Kiss(Fly(args.min_pas), Rail(), max_duration=args.max_duration))
+    asyncio.run(service.serve(args.host, args.port))